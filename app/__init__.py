@@ -18,6 +18,10 @@ def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
 
+    # JSON responses: skip key sorting (clients never depend on key order) so
+    # large payloads like transaction details serialize in a single pass
+    app.json.sort_keys = False
+
     # Configure logging to show INFO level messages (MOVED UP)
     # This must happen BEFORE validate_config() so validation warnings appear in logs
     app.logger.setLevel(logging.INFO)
@@ -3,6 +3,7 @@
 from . import db
 from datetime import datetime
 from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import deferred
 # --------------------------------------------------
 
 # This file defines the structure of your three database tables using Python classes.
@@ -77,8 +78,12 @@ class Transaction(db.Model):
     submissionDate = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     approvalDate = db.Column(db.DateTime, nullable=True)
     rejection_note = db.Column(db.String(500), nullable=True)
-    financial_cache = db.Column(db.JSON, nullable=True)  # Stores cached financial metrics for APPROVED/REJECTED transactions
+    # Stores cached financial metrics (incl. the timeline). Deferred: it is only
+    # read by the details view (which undefers it); every other path just
+    # overwrites it, so loading and parsing the JSON blob there is wasted work
+    financial_cache = deferred(db.Column(db.JSON, nullable=True))
     master_variables_snapshot = db.Column(db.JSON, nullable=True)  # Frozen MasterVariables captured at transaction creation
+    children_digest = db.Column(db.String(32), nullable=True)  # Digest of the stored fixed cost / recurring service rows (skips unchanged rewrites)
 
     # --- Database Indexes for Performance Optimization ---
     __table_args__ = (
@@ -94,6 +99,13 @@ class Transaction(db.Model):
         # Used in: kpi.py - get_average_gross_margin() with optional filters
         db.Index('idx_transaction_approval_salesman_submission',
                  'ApprovalStatus', 'salesman', 'submissionDate'),
+
+        # Trigram (pg_trgm) indexes for the ILIKE '%term%' list search
+        # Used in: transactions.py - get_transactions() search filter
+        db.Index('idx_transaction_clientname_trgm', 'clientName',
+                 postgresql_using='gin', postgresql_ops={'clientName': 'gin_trgm_ops'}),
+        db.Index('idx_transaction_salesman_trgm', 'salesman',
+                 postgresql_using='gin', postgresql_ops={'salesman': 'gin_trgm_ops'}),
     )
 
     # --- Relationships to the other tables ---
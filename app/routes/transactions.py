@@ -1,6 +1,7 @@
 # app/api/transactions.py
 # (This file is for all transaction related routes.)
 
+from datetime import datetime
 from flask import Blueprint, request, jsonify
 from app.jwt_auth import require_jwt, finance_admin_required
 from app.utils import allowed_file, _handle_service_result
@@ -86,7 +87,6 @@ def get_transactions_route():
     end_date = request.args.get('end_date', None, type=str)
 
     # Convert ISO date strings to datetime objects if provided
-    from datetime import datetime
     parsed_start = datetime.fromisoformat(start_date) if start_date else None
     parsed_end = datetime.fromisoformat(end_date) if end_date else None
 
@@ -113,7 +113,16 @@ def get_transaction_template_route():
 def get_transaction_details_route(transaction_id):
     result = get_transaction_details(transaction_id)
     # Service returns a tuple (dict, 404 or 500) on failure
-    return _handle_service_result(result, default_error_status=404)
+    response, status_code = _handle_service_result(result, default_error_status=404)
+    if status_code != 200:
+        return response, status_code
+
+    # Conditional GET: the browser revalidates with If-None-Match and gets an
+    # empty 304 when the details are unchanged (e.g. reopening the same
+    # transaction), skipping the download and JSON parse of the timeline
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.add_etag()
+    return response.make_conditional(request)
 
 @bp.route('/transaction/<string:transaction_id>', methods=['PUT'])
 @require_jwt
@@ -34,14 +34,11 @@ def _send_email(app, msg):
             smtp.send_message(msg)
             smtp.quit()
 
-            print(f"--- DIAGNOSTIC: Email sent successfully to {msg['To']} ---")
+            current_app.logger.debug("Email sent successfully to %s", msg['To'])
 
         except Exception as e:
             # Log the error
-            print(f"--- ERROR SENDING EMAIL ---")
-            print(f"To: {msg['To']}")
-            print(f"Error: {str(e)}")
-            print(f"--- END EMAIL ERROR ---")
+            current_app.logger.error("Error sending email to %s: %s", msg['To'], str(e))
             raise  # Re-raise so caller knows it failed
 
 def send_email_async(to_addresses, subject, body_text):
@@ -97,7 +94,7 @@ def send_new_transaction_email(salesman_name, client_name, salesman_email):
     default_recipient = app.config.get('MAIL_DEFAULT_RECIPIENT')
     
     if not default_recipient or not app.config.get('MAIL_USERNAME'):
-        print("--- DIAGNOSTIC: MAIL_DEFAULT_RECIPIENT or MAIL_USERNAME not set. Skipping email. ---")
+        current_app.logger.warning("MAIL_DEFAULT_RECIPIENT or MAIL_USERNAME not set. Skipping email.")
         return
 
     # Prepare recipients
@@ -115,14 +112,14 @@ def send_status_update_email(transaction, new_status):
     Sends to the salesman who submitted it.
     """
     if not current_app.config.get('MAIL_USERNAME'):
-        print("--- DIAGNOSTIC: MAIL_USERNAME not set. Skipping email. ---")
+        current_app.logger.warning("MAIL_USERNAME not set. Skipping email.")
         return
 
     # 1. Find the salesman's email from the transaction
     sales_user = User.query.filter_by(username=transaction.salesman).first()
     
     if not sales_user or not sales_user.email:
-        print(f"--- DIAGNOSTIC: Could not find email for salesman {transaction.salesman}. Skipping email. ---")
+        current_app.logger.warning("Could not find email for salesman %s. Skipping email.", transaction.salesman)
         return
         
     recipient_email = sales_user.email
@@ -1,7 +1,6 @@
 # app/services/excel_parser.py
 # (This file is responsible for all Excel file ingestion and parsing.)
 
-import traceback
 from flask import current_app
 from app.jwt_auth import require_jwt
 from openpyxl import load_workbook
@@ -224,10 +223,6 @@ def process_excel_file(excel_file):
                 item['ingreso'] = q * p_original
                 item['egreso'] = (cu1_original + cu2_original) * q
 
-            # <-- MODIFIED: This is the total in *original* currency, not PEN
-            calculated_costoInstalacion = sum(
-                item.get('total', 0) for item in fixed_costs_data if item.get('total') is not None)
-
             # Step 4: Validate Inputs
             client_name = header_data.get('clientName')
             mrc_value = header_data.get('MRC')
@@ -241,8 +236,9 @@ def process_excel_file(excel_file):
             header_data['NRC_currency'] = 'PEN'
 
             # Consolidate all extracted data
+            # ('costoInstalacion' is derived by the calculator from the fixed costs)
             full_extracted_data = {**header_data, 'recurring_services': recurring_services_data,
-                                   'fixed_costs': fixed_costs_data, 'costoInstalacion': calculated_costoInstalacion}
+                                   'fixed_costs': fixed_costs_data}
 
             # Step 5: Calculate Metrics
             # This function now calculates *all* metrics, including the *real* commission.
@@ -276,8 +272,5 @@ def process_excel_file(excel_file):
                 current_app.logger.info("Workbook closed successfully")
 
     except Exception as e:
-        import traceback
-        print("--- ERROR DURING EXCEL PROCESSING ---")
-        print(traceback.format_exc())
-        print("--- END ERROR ---")
+        current_app.logger.error("Error during Excel processing: %s", str(e), exc_info=True)
         return {"success": False, "error": f"An unexpected error occurred: {str(e)}"}
\ No newline at end of file
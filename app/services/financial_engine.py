@@ -2,6 +2,8 @@
 # Modular Financial Engine — decomposed from _calculate_financial_metrics
 # This module is a pure logic library with NO imports from transactions.py.
 
+from itertools import accumulate
+
 from .commission_rules import _calculate_final_commission
 from app.utils.math_utils import calculate_npv, calculate_irr
 
@@ -32,26 +34,30 @@ def process_recurring_services(services, converter):
     """
     mrc_sum_orig = 0.0
     total_monthly_expense_pen = 0.0
+    tipo_cambio = converter.tipo_cambio
 
     for item in services:
         q = item.get('Q') or 0
 
+        # Resolve the PEN multiplier once per currency instead of calling
+        # converter.to_pen() for every amount (P, CU1 and CU2).
         P_original = item.get('P_original') or 0.0
-        P_currency = item.get('P_currency', 'PEN')
-        P_pen = converter.to_pen(P_original, P_currency)
+        P_mult = tipo_cambio if item.get('P_currency', 'PEN') == 'USD' else 1.0
+        P_pen = P_original * P_mult
         item['P_pen'] = P_pen
         item['ingreso_pen'] = P_pen * q
         mrc_sum_orig += P_original * q
 
         CU1_original = item.get('CU1_original') or 0.0
         CU2_original = item.get('CU2_original') or 0.0
-        CU_currency = item.get('CU_currency', 'USD')
-        CU1_pen = converter.to_pen(CU1_original, CU_currency)
-        CU2_pen = converter.to_pen(CU2_original, CU_currency)
+        CU_mult = tipo_cambio if item.get('CU_currency', 'USD') == 'USD' else 1.0
+        CU1_pen = CU1_original * CU_mult
+        CU2_pen = CU2_original * CU_mult
         item['CU1_pen'] = CU1_pen
         item['CU2_pen'] = CU2_pen
-        item['egreso_pen'] = (CU1_pen + CU2_pen) * q
-        total_monthly_expense_pen += item['egreso_pen']
+        egreso_pen = (CU1_pen + CU2_pen) * q
+        item['egreso_pen'] = egreso_pen
+        total_monthly_expense_pen += egreso_pen
 
     return services, total_monthly_expense_pen, mrc_sum_orig
 
@@ -81,21 +87,37 @@ def process_fixed_costs(fixed_costs, converter):
     """
     Normalizes fixed costs to PEN and calculates total.
 
+    The timeline schedule of each cost is parsed in the same pass, so the
+    timeline builder does not need to read the cost dicts again.
+
     Returns:
-        (enriched_costs, total_installation_pen)
+        (enriched_costs, total_installation_pen, schedule) where schedule is a
+        list of (cost_item, total_pen, periodo_inicio, duracion_meses) tuples
     """
     total_installation_pen = 0.0
+    tipo_cambio = converter.tipo_cambio
+    schedule = []
 
     for item in fixed_costs:
         cantidad = item.get('cantidad') or 0
         costoUnitario_original = item.get('costoUnitario_original') or 0.0
-        costoUnitario_currency = item.get('costoUnitario_currency', 'USD')
-        costoUnitario_pen = converter.to_pen(costoUnitario_original, costoUnitario_currency)
+        if item.get('costoUnitario_currency', 'USD') == 'USD':
+            costoUnitario_pen = costoUnitario_original * tipo_cambio
+        else:
+            costoUnitario_pen = costoUnitario_original
         item['costoUnitario_pen'] = costoUnitario_pen
-        item['total_pen'] = cantidad * costoUnitario_pen
-        total_installation_pen += item['total_pen']
+        total_pen = cantidad * costoUnitario_pen
+        item['total_pen'] = total_pen
+        total_installation_pen += total_pen
 
-    return fixed_costs, total_installation_pen
+        schedule.append((
+            item,
+            total_pen,
+            int(item.get('periodo_inicio') or 0),
+            int(item.get('duracion_meses') or 1),
+        ))
+
+    return fixed_costs, total_installation_pen, schedule
 
 
 # --- 5. CartaFianzaCalculator ---
@@ -153,42 +175,53 @@ def initialize_timeline(num_periods):
 
 
 def build_timeline(num_periods, nrc_pen, mrc_pen, comisiones, carta_fianza_pen,
-                   monthly_expense_pen, fixed_costs):
+                   monthly_expense_pen, fixed_cost_schedule):
     """
     Builds period-by-period cash flow timeline.
 
+    Args:
+        fixed_cost_schedule: (cost_item, total_pen, periodo_inicio, duracion_meses)
+            tuples as returned by process_fixed_costs
+
     Returns:
         (timeline_dict, total_fixed_costs_applied_pen, net_cash_flow_list)
     """
     timeline = initialize_timeline(num_periods)
+    revenues = timeline['revenues']
+    expenses = timeline['expenses']
+    recurring_periods = num_periods - 1
 
     # A. Revenues
-    timeline['revenues']['nrc'][0] = nrc_pen
-    for i in range(1, num_periods):
-        timeline['revenues']['mrc'][i] = mrc_pen
+    revenues['nrc'][0] = nrc_pen
+    revenues['mrc'][1:] = [mrc_pen] * recurring_periods
 
     # B. Expenses
-    timeline['expenses']['comisiones'][0] = -comisiones - carta_fianza_pen
-    for i in range(1, num_periods):
-        timeline['expenses']['egreso'][i] = -monthly_expense_pen
+    upfront_expense = -comisiones - carta_fianza_pen
+    expenses['comisiones'][0] = upfront_expense
+    expenses['egreso'][1:] = [-monthly_expense_pen] * recurring_periods
+
+    # Net cash flow starts from the revenue/expense components, which are
+    # constant per period; fixed costs are folded in below only over the
+    # periods each cost actually covers.
+    net_cash_flow_list = [mrc_pen - monthly_expense_pen] * num_periods
+    net_cash_flow_list[0] = nrc_pen + upfront_expense
 
     # C. Fixed costs distribution
     total_fixed_costs_applied_pen = 0.0
-    for cost_item in fixed_costs:
-        cost_total_pen = cost_item.get('total_pen', 0.0)
-        periodo_inicio = int(cost_item.get('periodo_inicio', 0) or 0)
-        duracion_meses = int(cost_item.get('duracion_meses', 1) or 1)
-
+    for cost_item, cost_total_pen, periodo_inicio, duracion_meses in fixed_cost_schedule:
         cost_timeline_values = [0.0] * num_periods
         distributed_cost = cost_total_pen / duracion_meses
 
-        for i in range(duracion_meses):
-            current_period = periodo_inicio + i
-            if current_period < num_periods:
-                cost_timeline_values[current_period] = -distributed_cost
-                total_fixed_costs_applied_pen += distributed_cost
+        # Periods covered by this cost, clipped to the contract timeline
+        start = max(periodo_inicio, 0)
+        stop = min(periodo_inicio + duracion_meses, num_periods)
+        if stop > start:
+            cost_timeline_values[start:stop] = [-distributed_cost] * (stop - start)
+            for current_period in range(start, stop):
+                net_cash_flow_list[current_period] -= distributed_cost
+            total_fixed_costs_applied_pen += distributed_cost * (stop - start)
 
-        timeline['expenses']['fixed_costs'].append({
+        expenses['fixed_costs'].append({
             "id": cost_item.get('id'),
             "categoria": cost_item.get('categoria'),
             "tipo_servicio": cost_item.get('tipo_servicio'),
@@ -199,19 +232,7 @@ def build_timeline(num_periods, nrc_pen, mrc_pen, comisiones, carta_fianza_pen,
         })
 
     # D. Net cash flow
-    net_cash_flow_list = []
-    for t in range(num_periods):
-        net_t = (
-            timeline['revenues']['nrc'][t] +
-            timeline['revenues']['mrc'][t] +
-            timeline['expenses']['comisiones'][t] +
-            timeline['expenses']['egreso'][t]
-        )
-        for fc in timeline['expenses']['fixed_costs']:
-            net_t += fc['timeline_values'][t]
-
-        timeline['net_cash_flow'][t] = net_t
-        net_cash_flow_list.append(net_t)
+    timeline['net_cash_flow'] = net_cash_flow_list
 
     return timeline, total_fixed_costs_applied_pen, net_cash_flow_list
 
@@ -230,13 +251,11 @@ def calculate_kpis(net_cash_flow_list, total_revenue, total_expense, costo_capit
     van = calculate_npv(monthly_discount_rate, net_cash_flow_list)
     tir = calculate_irr(net_cash_flow_list)
 
-    cumulative_cash_flow = 0
-    payback = None
-    for i, flow in enumerate(net_cash_flow_list):
-        cumulative_cash_flow += flow
-        if cumulative_cash_flow >= 0:
-            payback = i
-            break
+    # Payback: first period whose cumulative cash flow is non-negative
+    payback = next(
+        (i for i, cumulative in enumerate(accumulate(net_cash_flow_list)) if cumulative >= 0),
+        None
+    )
 
     gross_margin = total_revenue - total_expense
 
@@ -274,6 +293,8 @@ def calculate_financial_metrics(data):
     """
     converter = CurrencyConverter(data.get('tipoCambio', 1))
     plazo = int(data.get('plazoContrato', 0))
+    mrc_currency = data.get('MRC_currency', 'PEN')
+    aplica_carta_fianza = data.get('aplicaCartaFianza', False)
 
     # 1. Process recurring services
     services, monthly_expense_pen, mrc_sum_orig = process_recurring_services(
@@ -281,21 +302,20 @@ def calculate_financial_metrics(data):
 
     # 2. Resolve MRC (override vs. sum from services)
     mrc_orig, mrc_pen = resolve_mrc(
-        data.get('MRC_original', 0.0), mrc_sum_orig,
-        data.get('MRC_currency', 'PEN'), converter)
+        data.get('MRC_original'), mrc_sum_orig, mrc_currency, converter)
 
     # 3. NRC normalization
-    nrc_orig = data.get('NRC_original', 0.0) or 0.0
+    nrc_orig = data.get('NRC_original') or 0.0
     nrc_pen = converter.to_pen(nrc_orig, data.get('NRC_currency', 'PEN'))
 
     # 4. Fixed costs
-    costs, installation_pen = process_fixed_costs(
+    costs, installation_pen, fixed_cost_schedule = process_fixed_costs(
         data.get('fixed_costs', []), converter)
 
     # 5. Carta Fianza
     cf_orig, cf_pen = calculate_carta_fianza(
-        data.get('aplicaCartaFianza', False), data.get('tasaCartaFianza', 0.0),
-        plazo, mrc_orig, data.get('MRC_currency', 'PEN'), converter)
+        aplica_carta_fianza, data.get('tasaCartaFianza', 0.0),
+        plazo, mrc_orig, mrc_currency, converter)
 
     # 6. Revenue & pre-commission margin
     total_revenue = nrc_pen + (mrc_pen * plazo)
@@ -309,7 +329,7 @@ def calculate_financial_metrics(data):
     # 8. Timeline
     timeline, fixed_applied, ncf_list = build_timeline(
         plazo + 1, nrc_pen, mrc_pen, comisiones, cf_pen,
-        monthly_expense_pen, data.get('fixed_costs', []))
+        monthly_expense_pen, fixed_cost_schedule)
 
     # 9. KPIs
     total_expense = comisiones + fixed_applied + (monthly_expense_pen * plazo) + cf_pen
@@ -327,6 +347,6 @@ def calculate_financial_metrics(data):
         'costoInstalacion': fixed_applied,
         'costoInstalacionRatio': (fixed_applied / total_revenue) if total_revenue else 0,
         'costoCartaFianza': cf_pen,
-        'aplicaCartaFianza': data.get('aplicaCartaFianza', False),
+        'aplicaCartaFianza': aplica_carta_fianza,
         'timeline': timeline
     }
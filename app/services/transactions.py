@@ -5,35 +5,340 @@ from flask import current_app, g
 from app.jwt_auth import require_jwt
 from app import db
 from app.models import Transaction, FixedCost, RecurringService, User
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import selectinload, undefer
+import hashlib
 import json
-from datetime import datetime
+import math
+import threading
+import time
+from operator import attrgetter
 
 # --- Service Dependencies ---
 from .email_service import send_new_transaction_email, send_status_update_email
-from .financial_engine import CurrencyConverter, initialize_timeline, calculate_financial_metrics
+from .financial_engine import initialize_timeline, calculate_financial_metrics
+from .variables import get_latest_master_variables
 from app.utils.general import convert_to_json_safe
 
 
+# Transaction column attributes a recalculation may write, used to pick which
+# calculated metrics are persisted (set intersection instead of a hasattr() probe
+# per key). Taken from the mapper, so these are the attribute names setattr()
+# uses. Identity and workflow columns are never overwritten by calculated values.
+_TX_WRITABLE = frozenset(
+    column_attr.key for column_attr in Transaction.__mapper__.column_attrs
+) - {'id', 'ApprovalStatus', 'submissionDate'}
+
+# Columns returned by the paginated list endpoint: same fields as
+# Transaction.to_dict(exclude={'master_variables_snapshot'}), selected as plain
+# rows (no ORM instances, no child collections) since the list view needs neither
+_LIST_COLUMNS = tuple(
+    column for column in Transaction.__table__.columns
+    if column.name not in ('financial_cache', 'master_variables_snapshot', 'children_digest')
+)
+
+# Eager-load options for both child collections: selectinload fetches each
+# collection with one "WHERE transaction_id IN (...)" query, with no JOIN
+# multiplying rows (n_fixed_costs x n_recurring_services)
+_CHILD_LOAD_OPTIONS = (
+    selectinload(Transaction.fixed_costs),
+    selectinload(Transaction.recurring_services),
+)
+
+# --- FINANCIAL CACHE VERSIONING ---
+# Every financial_cache entry is stamped with this version. Bump it whenever the
+# shape of calculate_financial_metrics' output changes: PENDING entries stamped
+# with a different (or no) version are treated as a cache miss and self-heal on
+# read. APPROVED/REJECTED entries hold the metrics frozen at approval/rejection
+# and are never recalculated on read, whatever their version.
+# Version 2: a current cache also guarantees the recurring services have their
+# _pen fields backfilled (see _repair_legacy_pen_fields).
+_FINANCIAL_CACHE_VERSION = 2
+_FINANCIAL_CACHE_VERSION_KEY = 'cache_version'
+_FINALIZED_STATUSES = frozenset({'APPROVED', 'REJECTED'})
+
+
+def _stamp_financial_cache(clean_metrics):
+    """Returns the value to store in financial_cache for the given metrics."""
+    return {**clean_metrics, _FINANCIAL_CACHE_VERSION_KEY: _FINANCIAL_CACHE_VERSION}
+
+
+def _has_current_financial_cache(transaction):
+    """
+    True if the transaction's financial_cache was written by the current
+    calculator version (which also guarantees backfilled legacy _pen fields).
+
+    A current cache is not a substitute for recalculating: the commission rules
+    read the stored payback, so recalculating the same stored data can change
+    the commission. Approve/reject always recalculate before freezing metrics.
+    """
+    cache = transaction.financial_cache
+    return bool(cache) and cache.get(_FINANCIAL_CACHE_VERSION_KEY) == _FINANCIAL_CACHE_VERSION
+
+
 # --- HELPER FUNCTIONS ---
 
-def _generate_unique_id(customer_name, business_unit):
+# Last timestamp (in microseconds) used for a transaction ID in this process
+_last_id_micros = 0
+_id_lock = threading.Lock()
+
+
+def _generate_unique_id():
     """
     Generates a unique transaction ID using microseconds for maximum granularity.
     
-    Format: FLXYYYY(UNIT PART)-MMDDHHMMSSFFFFFF
+    Format: FLXYY-MMDDHHMMSSFFFFFF
     """
-    now = datetime.now()
-    
     # 1. Extract the Date/Time Components
-    year_part = now.strftime("%y")    
-    datetime_micro_part = now.strftime("%m%d%H%M%S%f") 
-    
-    # 2. Extract the Unit Part
-    unit_part = (business_unit or "XXX")[:3].upper()
-
-    # 3. Construct the new ID
+    # Built from time.time_ns() with fixed-width integer formatting
+    # (same output as strftime("%y") / strftime("%m%d%H%M%S%f") in local time)
+    global _last_id_micros
+    with _id_lock:
+        # Never reuse a microsecond within this process: two saves landing on
+        # the same clock tick get consecutive IDs instead of a PK collision
+        micros = max(time.time_ns() // 1000, _last_id_micros + 1)
+        _last_id_micros = micros
+    seconds, microseconds = divmod(micros, 1_000_000)
+    now = time.localtime(seconds)
+    year_part = f"{now.tm_year % 100:02d}"
+    datetime_micro_part = (
+        f"{now.tm_mon:02d}{now.tm_mday:02d}{now.tm_hour:02d}"
+        f"{now.tm_min:02d}{now.tm_sec:02d}{microseconds:06d}"
+    )
+
+    # 2. Construct the new ID
     return f"FLX{year_part}-{datetime_micro_part}"
 
+# Transaction columns read by calculate_financial_metrics and the commission
+# rules. The commission rules read the stored payback (computed before commission).
+_CALC_INPUT_FIELDS = (
+    'unidadNegocio', 'tipoCambio', 'plazoContrato',
+    'MRC_original', 'MRC_currency', 'NRC_original', 'NRC_currency',
+    'costoCapitalAnual', 'tasaCartaFianza', 'aplicaCartaFianza',
+    'gigalan_region', 'gigalan_sale_type', 'gigalan_old_mrc',
+    'payback',
+)
+_get_calc_inputs = attrgetter(*_CALC_INPUT_FIELDS)
+
+def _assemble_calc_payload(transaction, fixed_costs=None, recurring_services=None):
+    """
+    Builds the input dictionary for calculate_financial_metrics from a Transaction.
+
+    Only the fields read by the financial engine and the commission rules are
+    copied, straight from the model attributes, instead of serializing the whole
+    row with to_dict() (timestamps, status, JSON snapshot, etc.).
+
+    Args:
+        fixed_costs, recurring_services: Optional child dicts already built with
+            to_dict(); they are shallow-copied (the engine mutates its input)
+            instead of serializing the ORM rows again.
+    """
+    if fixed_costs is None:
+        fixed_costs = [fc.to_dict() for fc in transaction.fixed_costs]
+    else:
+        fixed_costs = [dict(cost) for cost in fixed_costs]
+    if recurring_services is None:
+        recurring_services = [rs.to_dict() for rs in transaction.recurring_services]
+    else:
+        recurring_services = [dict(service) for service in recurring_services]
+
+    tx_data = dict(zip(_CALC_INPUT_FIELDS, _get_calc_inputs(transaction)))
+    tx_data['fixed_costs'] = fixed_costs
+    tx_data['recurring_services'] = recurring_services
+    return tx_data
+
+
+def _repair_legacy_pen_fields(recurring_services, tipo_cambio):
+    """
+    Backfills missing P_pen / CU1_pen / CU2_pen on legacy recurring services
+    (rows saved before the _pen columns were populated).
+
+    The fix is applied to the ORM objects so it is persisted on the next commit
+    and later reads skip it entirely.
+
+    Returns:
+        bool: True if any service was modified
+    """
+    tipo_cambio = tipo_cambio or 1
+    repaired = False
+
+    for service in recurring_services:
+        if not service.Q:
+            continue
+
+        # ingreso_pen is zero/None only when P_pen is missing
+        if not service.P_pen and service.P_original:
+            P_mult = tipo_cambio if service.P_currency == 'USD' else 1.0
+            service.P_pen = service.P_original * P_mult
+            repaired = True
+
+        if not service.egreso_pen:
+            # Same multiplier for both unit costs: resolve the currency once
+            CU_mult = tipo_cambio if service.CU_currency == 'USD' else 1.0
+            CU1_pen = (service.CU1_original or 0.0) * CU_mult
+            CU2_pen = (service.CU2_original or 0.0) * CU_mult
+            if CU1_pen or CU2_pen:
+                service.CU1_pen = CU1_pen
+                service.CU2_pen = CU2_pen
+                repaired = True
+
+    return repaired
+
+def _fixed_cost_row(transaction_id, cost_item):
+    """Maps a fixed-cost payload item to FixedCost column values for a bulk INSERT."""
+    return {
+        'transaction_id': transaction_id,
+        'categoria': cost_item.get('categoria'),
+        'tipo_servicio': cost_item.get('tipo_servicio'),
+        'ticket': cost_item.get('ticket'),
+        'ubicacion': cost_item.get('ubicacion'),
+        'cantidad': cost_item.get('cantidad'),
+        'costoUnitario_original': cost_item.get('costoUnitario_original'),
+        'costoUnitario_currency': cost_item.get('costoUnitario_currency', 'USD'),
+        'costoUnitario_pen': cost_item.get('costoUnitario_pen'),
+        'periodo_inicio': cost_item.get('periodo_inicio', 0),
+        'duracion_meses': cost_item.get('duracion_meses', 1)
+    }
+
+
+def _recurring_service_row(transaction_id, service_item, tipo_cambio):
+    """
+    Maps a recurring-service payload item to RecurringService column values for a
+    bulk INSERT.
+
+    Missing P_pen / CU1_pen / CU2_pen are derived from the original amounts:
+    PEN amounts are copied as-is; only USD amounts are converted. Each payload
+    key is read once.
+    """
+    get = service_item.get
+    P_original = get('P_original')
+    P_currency = get('P_currency', 'PEN')
+    P_pen = get('P_pen')
+    CU1_original = get('CU1_original')
+    CU2_original = get('CU2_original')
+    CU_currency = get('CU_currency', 'USD')
+    CU1_pen = get('CU1_pen')
+    CU2_pen = get('CU2_pen')
+
+    # Ensure _pen fields are calculated if missing
+    if P_pen in (0, None, ''):
+        P_pen = P_original or 0.0
+        if P_currency == 'USD':
+            P_pen = P_pen * tipo_cambio
+
+    cu_in_usd = CU_currency == 'USD'
+    if CU1_pen in (0, None, ''):
+        CU1_pen = CU1_original or 0.0
+        if cu_in_usd:
+            CU1_pen = CU1_pen * tipo_cambio
+    if CU2_pen in (0, None, ''):
+        CU2_pen = CU2_original or 0.0
+        if cu_in_usd:
+            CU2_pen = CU2_pen * tipo_cambio
+
+    return {
+        'transaction_id': transaction_id,
+        'tipo_servicio': get('tipo_servicio'),
+        'nota': get('nota'),
+        'ubicacion': get('ubicacion'),
+        'Q': get('Q'),
+        'P_original': P_original,
+        'P_currency': P_currency,
+        'P_pen': P_pen,
+        'CU1_original': CU1_original,
+        'CU2_original': CU2_original,
+        'CU_currency': CU_currency,
+        'CU1_pen': CU1_pen,
+        'CU2_pen': CU2_pen,
+        'proveedor': get('proveedor')
+    }
+
+
+def _insert_rows(model, rows):
+    """
+    Inserts child rows with one INSERT statement executed for the whole list
+    (SQLAlchemy 2.0 bulk INSERT: no ORM objects or unit-of-work bookkeeping).
+    No-op for an empty list.
+
+    The ORM-enabled insert(model) is used rather than insert(model.__table__)
+    so the statement runs through the session's ORM execution path: child rows
+    reloaded later in the same session reflect the inserted values.
+    """
+    if rows:
+        db.session.execute(insert(model), rows)
+
+
+# Float columns of the child tables. Their values are hashed as floats, since
+# the same amount can arrive as 370.0 (engine-computed on save) or as 370
+# (echoed back by the browser, whose JSON drops the ".0" of whole numbers).
+_FIXED_COST_FLOAT_COLUMNS = frozenset(
+    column.name for column in FixedCost.__table__.columns if isinstance(column.type, db.Float)
+)
+_RECURRING_SERVICE_FLOAT_COLUMNS = frozenset(
+    column.name for column in RecurringService.__table__.columns if isinstance(column.type, db.Float)
+)
+
+
+def _digest_rows(rows, float_columns):
+    """Rows with integer values of Float columns converted to float (None is kept)."""
+    return [
+        {
+            key: float(value) if key in float_columns and isinstance(value, int) else value
+            for key, value in row.items()
+        }
+        for row in rows
+    ]
+
+
+def _children_digest(fixed_cost_rows, recurring_service_rows):
+    """
+    Digest of a transaction's child rows as they are stored (Float column values
+    normalized to float). Stored on the transaction so an update with unchanged
+    children can skip rewriting them. Key order independent (rows are
+    serialized with sorted keys).
+    """
+    serialized = json.dumps([
+        _digest_rows(fixed_cost_rows, _FIXED_COST_FLOAT_COLUMNS),
+        _digest_rows(recurring_service_rows, _RECURRING_SERVICE_FLOAT_COLUMNS),
+    ], sort_keys=True, default=str)
+    return hashlib.blake2b(serialized.encode(), digest_size=16).hexdigest()
+
+
+def _recalculate_and_persist_metrics(transaction):
+    """
+    Recalculates the financial metrics of a transaction from its stored data and
+    writes them to the model: metric columns plus financial_cache. Does not commit.
+
+    The children are read back from the session (typed column values and row
+    IDs, which the timeline's fixed-cost entries carry).
+
+    Returns:
+        dict: The JSON-safe metrics that were persisted
+    """
+    # No autoflush while the child collections load: the parent's pending
+    # changes (e.g. edited scalar fields) go out with the metrics below as one
+    # UPDATE at commit time. The collections are selected by transaction_id,
+    # which does not depend on any of those changes.
+    with db.session.no_autoflush:
+        # Stored rows are about to back a current cache: backfill legacy _pen
+        # fields now so cache-hit reads never need to check them
+        _repair_legacy_pen_fields(transaction.recurring_services, transaction.tipoCambio)
+
+        tx_data = _assemble_calc_payload(transaction)
+
+    clean_metrics = convert_to_json_safe(calculate_financial_metrics(tx_data))
+
+    # Update transaction with fresh calculations
+    # (covers costoInstalacion and the resolved MRC/NRC amounts as well)
+    for key in _TX_WRITABLE & clean_metrics.keys():
+        setattr(transaction, key, clean_metrics[key])
+
+    # <-- CACHE: Update cached metrics so reads are zero-CPU ---
+    transaction.financial_cache = _stamp_financial_cache(clean_metrics)
+    # ----------------------------------------------------------
+
+    return clean_metrics
+
 # --- MAIN SERVICE FUNCTIONS ---
 
 def _update_transaction_data(transaction, data_payload):
@@ -78,108 +383,52 @@ def _update_transaction_data(transaction, data_payload):
             if field in tx_data:
                 setattr(transaction, field, tx_data[field])
 
-        # 2. Replace FixedCost records (clear and recreate)
-        # Delete all existing fixed costs for this transaction
-        FixedCost.query.filter_by(transaction_id=transaction.id).delete()
-
-        # Create new fixed costs from payload
-        for cost_item in fixed_costs_data:
-            new_cost = FixedCost(
-                transaction=transaction,
-                categoria=cost_item.get('categoria'),
-                tipo_servicio=cost_item.get('tipo_servicio'),
-                ticket=cost_item.get('ticket'),
-                ubicacion=cost_item.get('ubicacion'),
-                cantidad=cost_item.get('cantidad'),
-                costoUnitario_original=cost_item.get('costoUnitario_original'),
-                costoUnitario_currency=cost_item.get('costoUnitario_currency', 'USD'),
-                costoUnitario_pen=cost_item.get('costoUnitario_pen'),
-                periodo_inicio=cost_item.get('periodo_inicio', 0),
-                duracion_meses=cost_item.get('duracion_meses', 1)
-            )
-            db.session.add(new_cost)
-
-        # 3. Replace RecurringService records (clear and recreate)
-        # Delete all existing recurring services for this transaction
-        RecurringService.query.filter_by(transaction_id=transaction.id).delete()
-
-        # Create new recurring services from payload
-        converter = CurrencyConverter(transaction.tipoCambio or 1)
-        for service_item in recurring_services_data:
-            # Ensure _pen fields are calculated if missing
-            if service_item.get('P_pen') in [0, None, '']:
-                P_original = service_item.get('P_original', 0)
-                P_currency = service_item.get('P_currency', 'PEN')
-                service_item['P_pen'] = converter.to_pen(P_original, P_currency)
-
-            if service_item.get('CU1_pen') in [0, None, '']:
-                CU1_original = service_item.get('CU1_original', 0)
-                CU_currency = service_item.get('CU_currency', 'USD')
-                service_item['CU1_pen'] = converter.to_pen(CU1_original, CU_currency)
-
-            if service_item.get('CU2_pen') in [0, None, '']:
-                CU2_original = service_item.get('CU2_original', 0)
-                CU_currency = service_item.get('CU_currency', 'USD')
-                service_item['CU2_pen'] = converter.to_pen(CU2_original, CU_currency)
-
-            new_service = RecurringService(
-                transaction=transaction,
-                tipo_servicio=service_item.get('tipo_servicio'),
-                nota=service_item.get('nota'),
-                ubicacion=service_item.get('ubicacion'),
-                Q=service_item.get('Q'),
-                P_original=service_item.get('P_original'),
-                P_currency=service_item.get('P_currency', 'PEN'),
-                P_pen=service_item.get('P_pen'),
-                CU1_original=service_item.get('CU1_original'),
-                CU2_original=service_item.get('CU2_original'),
-                CU_currency=service_item.get('CU_currency', 'USD'),
-                CU1_pen=service_item.get('CU1_pen'),
-                CU2_pen=service_item.get('CU2_pen'),
-                proveedor=service_item.get('proveedor')
-            )
-            db.session.add(new_service)
-
-        # 4. Flush changes to ensure relationships are updated before recalculation
-        db.session.flush()
+        # 2. Build the FixedCost and RecurringService rows from the payload
+        fixed_cost_rows = [_fixed_cost_row(transaction.id, cost_item) for cost_item in fixed_costs_data]
+        tipo_cambio = transaction.tipoCambio or 1
+        recurring_service_rows = [
+            _recurring_service_row(transaction.id, service_item, tipo_cambio)
+            for service_item in recurring_services_data
+        ]
 
-        # 5. Recalculate financial metrics based on new values
-        # Assemble data package for recalculation
-        recalc_data = transaction.to_dict()
-        recalc_data['fixed_costs'] = [fc.to_dict() for fc in transaction.fixed_costs]
-        recalc_data['recurring_services'] = [rs.to_dict() for rs in transaction.recurring_services]
-        recalc_data['gigalan_region'] = transaction.gigalan_region
-        recalc_data['gigalan_sale_type'] = transaction.gigalan_sale_type
-        recalc_data['gigalan_old_mrc'] = transaction.gigalan_old_mrc
-        recalc_data['tasaCartaFianza'] = transaction.tasaCartaFianza
-        recalc_data['aplicaCartaFianza'] = transaction.aplicaCartaFianza
-
-        # Calculate financial metrics
-        financial_metrics = calculate_financial_metrics(recalc_data)
-        clean_metrics = convert_to_json_safe(financial_metrics)
+        # 3. Replace the child records (clear and recreate), unless they are
+        # identical to the stored ones (e.g. only scalar fields were edited)
+        children_digest = _children_digest(fixed_cost_rows, recurring_service_rows)
+        if children_digest != transaction.children_digest:
+            # Delete all existing children with a single DELETE statement per
+            # table (rows are not loaded into the session first) and create
+            # the new ones with one multi-row INSERT per table.
+            # No autoflush: the parent's pending changes (scalar fields above,
+            # digest and metrics below) go out as one UPDATE at commit time.
+            with db.session.no_autoflush:
+                db.session.execute(
+                    delete(FixedCost).where(FixedCost.transaction_id == transaction.id),
+                    execution_options={'synchronize_session': False}
+                )
+                _insert_rows(FixedCost, fixed_cost_rows)
 
-        # 6. Update transaction with fresh calculations
-        for key, value in clean_metrics.items():
-            if hasattr(transaction, key):
-                setattr(transaction, key, value)
+                db.session.execute(
+                    delete(RecurringService).where(RecurringService.transaction_id == transaction.id),
+                    execution_options={'synchronize_session': False}
+                )
+                _insert_rows(RecurringService, recurring_service_rows)
+            transaction.children_digest = children_digest
 
-        transaction.costoInstalacion = clean_metrics.get('costoInstalacion')
-        transaction.MRC_original = clean_metrics.get('MRC_original')
-        transaction.MRC_pen = clean_metrics.get('MRC_pen')
-        transaction.NRC_original = clean_metrics.get('NRC_original')
-        transaction.NRC_pen = clean_metrics.get('NRC_pen')
+            # 4. Expire the child collections so the recalculation below
+            # reloads the rows that were just inserted
+            db.session.expire(transaction, ['fixed_costs', 'recurring_services'])
 
-        # <-- CACHE: Update cached metrics so reads are zero-CPU ---
-        transaction.financial_cache = clean_metrics
-        # ----------------------------------------------------------
+        # 5. Recalculate financial metrics based on new values and
+        # 6. update the transaction (and its financial_cache) with them.
+        # The children are loaded back from the database rather than taken from
+        # the INSERT rows: those carry neither the new row IDs (used by the
+        # timeline's fixed-cost entries) nor the typed column values.
+        _recalculate_and_persist_metrics(transaction)
 
         return {"success": True}, None
 
     except Exception as e:
-        import traceback
-        print("--- ERROR DURING TRANSACTION UPDATE ---")
-        print(traceback.format_exc())
-        print("--- END ERROR ---")
+        current_app.logger.error("Error updating data for transaction %s: %s", transaction.id, str(e), exc_info=True)
         return {"success": False, "error": f"Error updating transaction: {str(e)}"}, 500
 
 @require_jwt
@@ -225,12 +474,9 @@ def calculate_preview_metrics(request_data):
         # Add the cost/service lists
         full_data_package['fixed_costs'] = fixed_costs_data
         full_data_package['recurring_services'] = recurring_services_data
-        
-        # <-- MODIFIED: This 'costoInstalacion' is the *original* currency total.
-        # The calculate_financial_metrics function will handle the PEN conversion.
-        full_data_package['costoInstalacion'] = sum(
-            item.get('total', 0) for item in fixed_costs_data if item.get('total') is not None
-        )
+
+        # NOTE: 'costoInstalacion' is not pre-summed here: the calculator derives
+        # it (in PEN) from the fixed costs' schedule and returns it in the metrics.
         
         # 4. Call the refactored, stateless calculator
         # This one function now does *everything* (commissions, VAN, TIR, etc.)
@@ -247,10 +493,7 @@ def calculate_preview_metrics(request_data):
         return {"success": True, "data": final_data}
 
     except Exception as e:
-        import traceback
-        print("--- ERROR DURING PREVIEW CALCULATION ---")
-        print(traceback.format_exc())
-        print("--- END ERROR ---")
+        current_app.logger.error("Error during preview calculation: %s", str(e), exc_info=True)
         return {"success": False, "error": f"An unexpected error occurred during preview: {str(e)}"}, 500
 
 @require_jwt 
@@ -276,38 +519,10 @@ def recalculate_commission_and_metrics(transaction_id):
             return {"success": False, "error": f"Transaction is already {transaction.ApprovalStatus}. Financial metrics can only be modified for 'PENDING' transactions."}, 403
         # ---------------------------------------------
 
-        # 2. Assemble the data package
-        # We convert the DB model and its relationships into a simple dictionary.
-        tx_data = transaction.to_dict()
-        tx_data['fixed_costs'] = [fc.to_dict() for fc in transaction.fixed_costs]
-        tx_data['recurring_services'] = [rs.to_dict() for rs in transaction.recurring_services]
-        
-        # Add GIGALAN fields to the dict for the commission calculator
-        tx_data['gigalan_region'] = transaction.gigalan_region
-        tx_data['gigalan_sale_type'] = transaction.gigalan_sale_type
-        tx_data['gigalan_old_mrc'] = transaction.gigalan_old_mrc
-
-        tx_data['tasaCartaFianza'] = transaction.tasaCartaFianza # <-- ADD THIS LINE
-        tx_data['aplicaCartaFianza'] = transaction.aplicaCartaFianza
-
-        # 3. Recalculate all metrics (VAN, TIR, Commission, etc.)
-        # This one function now does *everything*
-        financial_metrics = calculate_financial_metrics(tx_data) # <-- REFACTORED
-        
-        # 4. Update the transaction object
-        clean_financial_metrics = convert_to_json_safe(financial_metrics)
-
-        for key, value in clean_financial_metrics.items():
-            if hasattr(transaction, key):
-                setattr(transaction, key, value)
-        
-        transaction.costoInstalacion = clean_financial_metrics.get('costoInstalacion')
-
-        # Update the MRC and NRC fields with calculated values
-        transaction.MRC_original = clean_financial_metrics.get('MRC_original')
-        transaction.MRC_pen = clean_financial_metrics.get('MRC_pen')
-        transaction.NRC_original = clean_financial_metrics.get('NRC_original')
-        transaction.NRC_pen = clean_financial_metrics.get('NRC_pen')
+        # 2. Recalculate all metrics (VAN, TIR, Commission, etc.) from the stored
+        # data and 3-4. update the transaction object, including financial_cache
+        # so the cache never lags behind the recalculated columns
+        _recalculate_and_persist_metrics(transaction)
 
         # 5. Commit changes
         db.session.commit()
@@ -329,28 +544,24 @@ def get_transactions(page=1, per_page=30, search=None, start_date=None, end_date
     - search: Optional ILIKE filter on clientName or salesman columns.
     - start_date/end_date: Optional date range filter on submissionDate.
 
-    PERFORMANCE FIX: Uses eager loading to prevent N+1 query problem.
+    PERFORMANCE FIX: Reads plain column rows with a Core SELECT (no ORM
+    instances or child collections, so no N+1 queries either).
     """
     try:
-        from sqlalchemy.orm import joinedload
-
-        # Start with the base query with eager loading
-        # This loads fixed_costs and recurring_services in a single JOIN query
-        query = Transaction.query.options(
-            joinedload(Transaction.fixed_costs),
-            joinedload(Transaction.recurring_services)
-        )
+        # Build the filter conditions once; they are shared by the page query
+        # and the count query
+        conditions = []
 
         # --- ROLE-BASED FILTERING (NEW LOGIC) ---
         if g.current_user.role == 'SALES':
             # Filter to show only transactions uploaded by this salesman
-            query = query.filter(Transaction.salesman == g.current_user.username)
+            conditions.append(Transaction.salesman == g.current_user.username)
         # ADMIN and FINANCE roles see all transactions, so no filter is needed.
 
         # --- SERVER-SIDE SEARCH FILTER ---
         if search:
             search_pattern = f"%{search}%"
-            query = query.filter(
+            conditions.append(
                 db.or_(
                     Transaction.clientName.ilike(search_pattern),
                     Transaction.salesman.ilike(search_pattern)
@@ -359,24 +570,45 @@ def get_transactions(page=1, per_page=30, search=None, start_date=None, end_date
 
         # --- DATE RANGE FILTER ---
         if start_date:
-            query = query.filter(Transaction.submissionDate >= start_date)
+            conditions.append(Transaction.submissionDate >= start_date)
         if end_date:
-            query = query.filter(Transaction.submissionDate <= end_date)
-
-        # Apply ordering and pagination
-        transactions = query.order_by(Transaction.submissionDate.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+            conditions.append(Transaction.submissionDate <= end_date)
+
+        # Same page/per_page fallbacks as paginate(error_out=False)
+        page = page if page and page > 0 else 1
+        per_page = per_page if per_page and per_page > 0 else 20
+
+        # Core SELECT of the list columns only: rows are turned straight into
+        # dicts, skipping ORM instances, the identity map and child collections
+        # (the list response never includes fixed costs or recurring services)
+        rows = db.session.execute(
+            select(*_LIST_COLUMNS)
+            .where(*conditions)
+            .order_by(Transaction.submissionDate.desc())
+            .limit(per_page)
+            .offset((page - 1) * per_page)
+        ).mappings()
+
+        transactions = []
+        for row in rows:
+            tx = dict(row)
+            tx['submissionDate'] = tx['submissionDate'].isoformat() if tx['submissionDate'] else None
+            tx['approvalDate'] = tx['approvalDate'].isoformat() if tx['approvalDate'] else None
+            transactions.append(tx)
+
+        total = db.session.execute(
+            select(func.count()).select_from(Transaction).where(*conditions)
+        ).scalar()
         # ------------------------------------------
 
         return {
             "success": True,
             "data": {
-                # Column projection: exclude heavy fields from list response
-                "transactions": [tx.to_dict(exclude={'master_variables_snapshot'}) for tx in transactions.items],
-                "total": transactions.total,
-                "pages": transactions.pages,
-                "current_page": transactions.page,
+                # Column projection: heavy fields are not selected for the list response
+                "transactions": transactions,
+                "total": total,
+                "pages": math.ceil(total / per_page) if total else 0,
+                "current_page": page,
                 # Optional: return user role for frontend context
                 "user_role": g.current_user.role 
             }
@@ -400,13 +632,10 @@ def get_transaction_details(transaction_id):
     PERFORMANCE FIX: Uses eager loading to prevent N+1 query problem.
     """
     try:
-        from sqlalchemy.orm import joinedload
-
-        # Start with a base query with eager loading
-        # This loads fixed_costs and recurring_services in a single JOIN query
+        # Start with a base query with eager loading of both child collections
+        # (financial_cache is a deferred column: load it with the row here)
         query = Transaction.query.options(
-            joinedload(Transaction.fixed_costs),
-            joinedload(Transaction.recurring_services)
+            *_CHILD_LOAD_OPTIONS, undefer(Transaction.financial_cache)
         ).filter_by(id=transaction_id)
 
         # --- ROLE-BASED ACCESS CHECK (NEW LOGIC) ---
@@ -418,38 +647,56 @@ def get_transaction_details(transaction_id):
         # ------------------------------------------
         
         if transaction:
+            cache_current = _has_current_financial_cache(transaction)
+            needs_commit = False
+
+            if not cache_current:
+                # --- FIX: Backfill _pen fields if missing (for legacy data) ---
+                # Only needed without a current cache: every current cache was
+                # written on rows that already have their _pen fields. The fix is
+                # persisted together with the self-healed cache below.
+                needs_commit = _repair_legacy_pen_fields(
+                    transaction.recurring_services, transaction.tipoCambio)
+                # --- END FIX ---
+
+            # Finalized transactions keep the metrics frozen at approval/rejection:
+            # any stored cache is used as-is, even from an older cache version
+            cache_hit = cache_current or bool(
+                transaction.financial_cache
+                and transaction.ApprovalStatus in _FINALIZED_STATUSES)
+
+            # Child rows are serialized once and shared by the response and,
+            # on a cache miss, the calculation payload
+            fixed_costs_list = [fc.to_dict() for fc in transaction.fixed_costs]
+            recurring_services_list = [rs.to_dict() for rs in transaction.recurring_services]
+
             # --- PERFORMANCE OPTIMIZATION: Use cache for immutable transactions ---
             # For APPROVED/REJECTED transactions, use cached metrics to avoid expensive recalculation
             # For PENDING transactions, calculate on-the-fly for live "what-if" analysis
 
-            if transaction.financial_cache:
+            if cache_hit:
                 # Cache hit - use stored metrics (zero CPU cost for ALL statuses)
-                clean_financial_metrics = transaction.financial_cache
                 transaction_details = transaction.to_dict()
-                transaction_details.update(clean_financial_metrics)
+                transaction_details.update(transaction.financial_cache)
+                transaction_details.pop(_FINANCIAL_CACHE_VERSION_KEY, None)
 
             else:
-                # Cache miss (legacy data or failed cache write) - recalculate and self-heal
+                # Cache miss (no cache, or a PENDING transaction with an outdated
+                # cache version) - recalculate and self-heal
                 current_app.logger.info("Cache miss for %s transaction %s - self-healing",
                                        transaction.ApprovalStatus, transaction.id)
 
                 # 1. Assemble the data package from the DB model
-                tx_data = transaction.to_dict()
-                tx_data['fixed_costs'] = [fc.to_dict() for fc in transaction.fixed_costs]
-                tx_data['recurring_services'] = [rs.to_dict() for rs in transaction.recurring_services]
-                tx_data['gigalan_region'] = transaction.gigalan_region
-                tx_data['gigalan_sale_type'] = transaction.gigalan_sale_type
-                tx_data['gigalan_old_mrc'] = transaction.gigalan_old_mrc
-                tx_data['tasaCartaFianza'] = transaction.tasaCartaFianza
-                tx_data['aplicaCartaFianza'] = transaction.aplicaCartaFianza
+                tx_data = _assemble_calc_payload(
+                    transaction, fixed_costs_list, recurring_services_list)
 
                 # 2. Calculate and cache the metrics
                 financial_metrics = calculate_financial_metrics(tx_data)
                 clean_financial_metrics = convert_to_json_safe(financial_metrics)
 
                 # 3. Self-heal: Update the cache for future requests
-                transaction.financial_cache = clean_financial_metrics
-                db.session.commit()
+                transaction.financial_cache = _stamp_financial_cache(clean_financial_metrics)
+                needs_commit = True
 
                 # 4. Merge into transaction details
                 transaction_details = transaction.to_dict()
@@ -457,47 +704,19 @@ def get_transaction_details(transaction_id):
 
             # --- END PERFORMANCE OPTIMIZATION ---
 
-            # --- FIX: Recalculate _pen fields if missing (for legacy data) ---
-            recurring_services_list = [rs.to_dict() for rs in transaction.recurring_services]
-            converter = CurrencyConverter(transaction.tipoCambio)
-
-            for service in recurring_services_list:
-                # If _pen fields are missing/zero but original values exist, recalculate
-                if (service.get('ingreso_pen') in [0, None] and
-                    service.get('P_original') and service.get('Q')):
-
-                    P_pen = converter.to_pen(
-                        service['P_original'],
-                        service.get('P_currency', 'PEN')
-                    )
-                    service['P_pen'] = P_pen
-                    service['ingreso_pen'] = P_pen * service['Q']
-
-                if (service.get('egreso_pen') in [0, None] and
-                    service.get('Q')):
-
-                    CU1_pen = converter.to_pen(
-                        service.get('CU1_original', 0),
-                        service.get('CU_currency', 'USD')
-                    )
-                    CU2_pen = converter.to_pen(
-                        service.get('CU2_original', 0),
-                        service.get('CU_currency', 'USD')
-                    )
-                    service['CU1_pen'] = CU1_pen
-                    service['CU2_pen'] = CU2_pen
-                    service['egreso_pen'] = (CU1_pen + CU2_pen) * service['Q']
-            # --- END FIX ---
-
-            return {
-                "success": True,
-                "data": {
-                    # This 'transaction_details' object now contains the 'timeline'
-                    "transactions": transaction_details,
-                    "fixed_costs": [fc.to_dict() for fc in transaction.fixed_costs],
-                    "recurring_services": recurring_services_list
-                }
+            response_data = {
+                # This 'transaction_details' object now contains the 'timeline'
+                "transactions": transaction_details,
+                "fixed_costs": fixed_costs_list,
+                "recurring_services": recurring_services_list
             }
+
+            # Persist self-heal writes (cache and/or _pen backfill) in one commit,
+            # after the response is built so no expired attributes are reloaded
+            if needs_commit:
+                db.session.commit()
+
+            return {"success": True, "data": response_data}
         else:
             # Return Not Found if transaction ID doesn't exist OR if the user doesn't have permission
             return {"success": False, "error": "Transaction not found or access denied."}
@@ -550,7 +769,7 @@ def save_transaction(data):
             current_app.logger.warning("Falling back to frontend-provided values for transaction")
         # -------------------------------------------------------
 
-        unique_id = _generate_unique_id(tx_data.get('clientName'), tx_data.get('unidadNegocio'))
+        unique_id = _generate_unique_id()
 
         # --- NEW STEP: Extract GIGALAN Data ---
         # This data now comes from the frontend modal
@@ -596,69 +815,37 @@ def save_transaction(data):
             # -----------------------------------------------------
             ApprovalStatus='PENDING',
             # <-- CACHE: Store calculated metrics at creation for zero-CPU reads ---
-            financial_cache=clean_metrics
+            financial_cache=_stamp_financial_cache(clean_metrics)
             # ----------------------------------------------------------------------
         )
+
+        # Child rows for the bulk INSERTs below (_pen fields are calculated if missing)
+        fixed_cost_rows = [
+            _fixed_cost_row(unique_id, cost_item) for cost_item in data.get('fixed_costs', [])
+        ]
+        save_tipo_cambio = tx_data.get('tipoCambio', 1) or 1
+        recurring_service_rows = [
+            _recurring_service_row(unique_id, service_item, save_tipo_cambio)
+            for service_item in data.get('recurring_services', [])
+        ]
+        new_transaction.children_digest = _children_digest(fixed_cost_rows, recurring_service_rows)
+
         db.session.add(new_transaction)
+        # Insert the parent row first: the child rows below are bulk-inserted
+        # directly and reference it by transaction_id
+        db.session.flush()
 
-        # Loop through fixed costs and add them
-        for cost_item in data.get('fixed_costs', []):
-            new_cost = FixedCost(
-                transaction=new_transaction, categoria=cost_item.get('categoria'),
-                tipo_servicio=cost_item.get('tipo_servicio'), ticket=cost_item.get('ticket'),
-                ubicacion=cost_item.get('ubicacion'), cantidad=cost_item.get('cantidad'),
-                costoUnitario_original=cost_item.get('costoUnitario_original'),
-                costoUnitario_currency=cost_item.get('costoUnitario_currency', 'USD'),
-                costoUnitario_pen=cost_item.get('costoUnitario_pen'),
-                periodo_inicio=cost_item.get('periodo_inicio', 0),
-                duracion_meses=cost_item.get('duracion_meses', 1)
-            )
-            db.session.add(new_cost)
-
-        # Loop through recurring services and add them
-        save_converter = CurrencyConverter(tx_data.get('tipoCambio', 1))
-        for service_item in data.get('recurring_services', []):
-            # --- FIX: Ensure _pen fields are calculated if missing ---
-            if service_item.get('P_pen') in [0, None, '']:
-                P_original = service_item.get('P_original', 0)
-                P_currency = service_item.get('P_currency', 'PEN')
-                service_item['P_pen'] = save_converter.to_pen(P_original, P_currency)
-
-            if service_item.get('CU1_pen') in [0, None, '']:
-                CU1_original = service_item.get('CU1_original', 0)
-                CU_currency = service_item.get('CU_currency', 'USD')
-                service_item['CU1_pen'] = save_converter.to_pen(CU1_original, CU_currency)
-
-            if service_item.get('CU2_pen') in [0, None, '']:
-                CU2_original = service_item.get('CU2_original', 0)
-                CU_currency = service_item.get('CU_currency', 'USD')
-                service_item['CU2_pen'] = save_converter.to_pen(CU2_original, CU_currency)
-            # --- END FIX ---
-
-            new_service = RecurringService(
-                transaction=new_transaction, tipo_servicio=service_item.get('tipo_servicio'),
-                nota=service_item.get('nota'), ubicacion=service_item.get('ubicacion'),
-                Q=service_item.get('Q'),
-                P_original=service_item.get('P_original'),
-                P_currency=service_item.get('P_currency', 'PEN'),
-                P_pen=service_item.get('P_pen'),
-                CU1_original=service_item.get('CU1_original'),
-                CU2_original=service_item.get('CU2_original'),
-                CU_currency=service_item.get('CU_currency', 'USD'),
-                CU1_pen=service_item.get('CU1_pen'),
-                CU2_pen=service_item.get('CU2_pen'),
-                proveedor=service_item.get('proveedor')
-            )
-            db.session.add(new_service)
+        # Insert all fixed costs and all recurring services with one bulk INSERT each
+        _insert_rows(FixedCost, fixed_cost_rows)
+        _insert_rows(RecurringService, recurring_service_rows)
 
         # --- DIAGNOSTIC CHANGES ---
-        db.session.flush()
         new_id = new_transaction.id
-        print(f"--- DIAGNOSTIC: Attempting to commit transaction with temporary ID: {new_id} by user {g.current_user.username} ---")
+        current_app.logger.debug("Committing transaction %s by user %s", new_id, g.current_user.username)
 
         db.session.commit()
 
-        print(f"--- DIAGNOSTIC: Commit successful for transaction ID: {new_id} ---")
+        current_app.logger.debug("Commit successful for transaction %s", new_id)
 
         # --- NEW: SEND SUBMISSION EMAIL ---
         try:
@@ -669,16 +856,13 @@ def save_transaction(data):
             )
         except Exception as e:
             # We log this error but do not fail the transaction
-            print(f"--- ERROR: Transaction saved, but email notification failed: {str(e)} ---")
+            current_app.logger.error("Transaction %s saved, but email notification failed: %s", new_id, str(e))
 
         return {"success": True, "message": "Transaction saved successfully.", "transaction_id": new_id}
 
     except Exception as e:
         db.session.rollback() # Roll back the transaction if any error occurs
-        import traceback
-        print("--- ERROR DURING SAVE ---")
-        print(traceback.format_exc())
-        print("--- END ERROR ---")
+        current_app.logger.error("Error saving transaction: %s", str(e), exc_info=True)
         return {"success": False, "error": f"Database error: {str(e)}"}
 
 @require_jwt
@@ -700,8 +884,9 @@ def update_transaction_content(transaction_id, data_payload):
         - FINANCE/ADMIN users can update any transaction
     """
     try:
-        # 1. Retrieve the transaction
-        transaction = Transaction.query.get(transaction_id)
+        # 1. Retrieve the transaction (children are not loaded: the update
+        # replaces them with bulk statements and reloads them afterwards)
+        transaction = db.session.get(Transaction, transaction_id)
         if not transaction:
             return {"success": False, "error": "Transaction not found."}, 404
 
@@ -746,7 +931,11 @@ def approve_transaction(transaction_id, data_payload=None):
     database has the latest calculated values (prevents stale data).
     """
     try:
-        transaction = Transaction.query.get(transaction_id)
+        # The recalculation below reads both child collections: eager-load
+        # them, unless a payload is about to replace them
+        transaction = db.session.get(
+            Transaction, transaction_id,
+            options=None if data_payload else _CHILD_LOAD_OPTIONS)
         if not transaction:
             return {"success": False, "error": "Transaction not found."}, 404
 
@@ -768,50 +957,26 @@ def approve_transaction(transaction_id, data_payload=None):
         # This ensures the database contains the latest calculated values
         # and prevents stale data from being frozen in the approved state
         try:
-            # Assemble data package for recalculation
-            tx_data = transaction.to_dict()
-            tx_data['fixed_costs'] = [fc.to_dict() for fc in transaction.fixed_costs]
-            tx_data['recurring_services'] = [rs.to_dict() for rs in transaction.recurring_services]
-            tx_data['gigalan_region'] = transaction.gigalan_region
-            tx_data['gigalan_sale_type'] = transaction.gigalan_sale_type
-            tx_data['gigalan_old_mrc'] = transaction.gigalan_old_mrc
-            tx_data['tasaCartaFianza'] = transaction.tasaCartaFianza
-            tx_data['aplicaCartaFianza'] = transaction.aplicaCartaFianza
-
-            # Recalculate financial metrics
-            financial_metrics = calculate_financial_metrics(tx_data)
-            clean_metrics = convert_to_json_safe(financial_metrics)
-
-            # Update transaction with fresh calculations
-            for key, value in clean_metrics.items():
-                if hasattr(transaction, key):
-                    setattr(transaction, key, value)
-
-            transaction.costoInstalacion = clean_metrics.get('costoInstalacion')
-            transaction.MRC_original = clean_metrics.get('MRC_original')
-            transaction.MRC_pen = clean_metrics.get('MRC_pen')
-            transaction.NRC_original = clean_metrics.get('NRC_original')
-            transaction.NRC_pen = clean_metrics.get('NRC_pen')
-
-            # --- PERFORMANCE OPTIMIZATION: Cache financial metrics ---
-            # Store the complete calculated metrics in financial_cache
-            # This prevents expensive recalculations when viewing approved transactions
-            transaction.financial_cache = clean_metrics
-            # --------------------------------------------------------
+            # Recalculated metrics are also stored in financial_cache, which
+            # prevents expensive recalculations when viewing approved transactions
+            _recalculate_and_persist_metrics(transaction)
         except Exception as calc_error:
             current_app.logger.error("Error recalculating metrics before approval for ID %s: %s", transaction_id, str(calc_error), exc_info=True)
             # Continue with approval even if recalculation fails (log the error but don't block)
         # ---------------------------------------------------------
 
         transaction.ApprovalStatus = 'APPROVED'
-        transaction.approvalDate = datetime.utcnow()
+        # Timestamp computed by the database inside the UPDATE itself, as naive
+        # UTC like submissionDate (now() is timestamptz: converting it explicitly
+        # keeps the value independent of the session TimeZone)
+        transaction.approvalDate = func.timezone('utc', func.now())
         db.session.commit()
 
         # --- NEW: SEND APPROVAL EMAIL ---
         try:
             send_status_update_email(transaction, "APPROVED")
         except Exception as e:
-            print(f"--- ERROR: Transaction approved, but email notification failed: {str(e)} ---")
+            current_app.logger.error("Transaction %s approved, but email notification failed: %s", transaction_id, str(e))
         # --------------------------------
 
         return {"success": True, "message": "Transaction approved successfully."}
@@ -837,7 +1002,11 @@ def reject_transaction(transaction_id, rejection_note=None, data_payload=None):
     database has the latest calculated values (prevents stale data).
     """
     try:
-        transaction = Transaction.query.get(transaction_id)
+        # The recalculation below reads both child collections: eager-load
+        # them, unless a payload is about to replace them
+        transaction = db.session.get(
+            Transaction, transaction_id,
+            options=None if data_payload else _CHILD_LOAD_OPTIONS)
         if not transaction:
             return {"success": False, "error": "Transaction not found."}, 404
 
@@ -859,43 +1028,19 @@ def reject_transaction(transaction_id, rejection_note=None, data_payload=None):
         # This ensures the database contains the latest calculated values
         # and prevents stale data from being frozen in the rejected state
         try:
-            # Assemble data package for recalculation
-            tx_data = transaction.to_dict()
-            tx_data['fixed_costs'] = [fc.to_dict() for fc in transaction.fixed_costs]
-            tx_data['recurring_services'] = [rs.to_dict() for rs in transaction.recurring_services]
-            tx_data['gigalan_region'] = transaction.gigalan_region
-            tx_data['gigalan_sale_type'] = transaction.gigalan_sale_type
-            tx_data['gigalan_old_mrc'] = transaction.gigalan_old_mrc
-            tx_data['tasaCartaFianza'] = transaction.tasaCartaFianza
-            tx_data['aplicaCartaFianza'] = transaction.aplicaCartaFianza
-
-            # Recalculate financial metrics
-            financial_metrics = calculate_financial_metrics(tx_data)
-            clean_metrics = convert_to_json_safe(financial_metrics)
-
-            # Update transaction with fresh calculations
-            for key, value in clean_metrics.items():
-                if hasattr(transaction, key):
-                    setattr(transaction, key, value)
-
-            transaction.costoInstalacion = clean_metrics.get('costoInstalacion')
-            transaction.MRC_original = clean_metrics.get('MRC_original')
-            transaction.MRC_pen = clean_metrics.get('MRC_pen')
-            transaction.NRC_original = clean_metrics.get('NRC_original')
-            transaction.NRC_pen = clean_metrics.get('NRC_pen')
-
-            # --- PERFORMANCE OPTIMIZATION: Cache financial metrics ---
-            # Store the complete calculated metrics in financial_cache
-            # This prevents expensive recalculations when viewing rejected transactions
-            transaction.financial_cache = clean_metrics
-            # --------------------------------------------------------
+            # Recalculated metrics are also stored in financial_cache, which
+            # prevents expensive recalculations when viewing rejected transactions
+            _recalculate_and_persist_metrics(transaction)
         except Exception as calc_error:
             current_app.logger.error("Error recalculating metrics before rejection for ID %s: %s", transaction_id, str(calc_error), exc_info=True)
             # Continue with rejection even if recalculation fails (log the error but don't block)
         # ---------------------------------------------------------
 
         transaction.ApprovalStatus = 'REJECTED'
-        transaction.approvalDate = datetime.utcnow()
+        # Timestamp computed by the database inside the UPDATE itself, as naive
+        # UTC like submissionDate (now() is timestamptz: converting it explicitly
+        # keeps the value independent of the session TimeZone)
+        transaction.approvalDate = func.timezone('utc', func.now())
 
         # Store rejection note if provided
         if rejection_note:
@@ -907,7 +1052,7 @@ def reject_transaction(transaction_id, rejection_note=None, data_payload=None):
         try:
             send_status_update_email(transaction, "REJECTED")
         except Exception as e:
-            print(f"--- ERROR: Transaction rejected, but email notification failed: {str(e)} ---")
+            current_app.logger.error("Transaction %s rejected, but email notification failed: %s", transaction_id, str(e))
         # ---------------------------------
 
         return {"success": True, "message": "Transaction rejected successfully."}
@@ -919,6 +1064,52 @@ def reject_transaction(transaction_id, rejection_note=None, data_payload=None):
 
 # --- TRANSACTION TEMPLATE SERVICE ---
 
+# --- TRANSACTION TEMPLATE ---
+# Static part of the empty transaction returned by get_transaction_template,
+# built once at import. The per-request fields (salesman, current rates and
+# timeline) are filled in on a copy; None placeholders keep the key order.
+_TEMPLATE_DEFAULT_PLAZO = 36  # Default contract term in months
+_TEMPLATE_TRANSACTION = {
+    "id": None,
+    "unidadNegocio": "",
+    "clientName": "",
+    "companyID": "",
+    "salesman": None,
+    "orderID": "",
+    "tipoCambio": None,
+    "MRC_original": 0,
+    "MRC_currency": "PEN",
+    "MRC_pen": 0,
+    "NRC_original": 0,
+    "NRC_currency": "PEN",
+    "NRC_pen": 0,
+    "VAN": 0,
+    "TIR": 0,
+    "payback": 0,
+    "totalRevenue": 0,
+    "totalExpense": 0,
+    "comisiones": 0,
+    "comisionesRate": 0,
+    "costoInstalacion": 0,
+    "costoInstalacionRatio": 0,
+    "grossMargin": 0,
+    "grossMarginRatio": 0,
+    "plazoContrato": _TEMPLATE_DEFAULT_PLAZO,
+    "costoCapitalAnual": None,
+    "tasaCartaFianza": None,
+    "costoCartaFianza": 0,
+    "aplicaCartaFianza": True,
+    "gigalan_region": None,
+    "gigalan_sale_type": None,
+    "gigalan_old_mrc": None,
+    "ApprovalStatus": "PENDING",
+    "submissionDate": None,
+    "approvalDate": None,
+    "rejection_note": None,
+    "timeline": None,
+}
+
+
 @require_jwt
 def get_transaction_template():
     """
@@ -930,8 +1121,6 @@ def get_transaction_template():
     Returns:
         dict: Success response with template data, or error if MasterVariables missing
     """
-    from app.services.variables import get_latest_master_variables
-
     try:
         # 1. Fetch current MasterVariables
         required_vars = ['tipoCambio', 'costoCapital', 'tasaCartaFianza']
@@ -945,49 +1134,14 @@ def get_transaction_template():
                 "error": f"System rates ({', '.join(missing_vars)}) are not configured. Please contact Finance."
             }, 400
 
-        # 3. Build the default transaction template
-        default_plazo = 36  # Default contract term in months
-
-        template_transaction = {
-            "id": None,
-            "unidadNegocio": "",
-            "clientName": "",
-            "companyID": "",
-            "salesman": g.current_user.username,
-            "orderID": "",
-            "tipoCambio": master_vars['tipoCambio'],
-            "MRC_original": 0,
-            "MRC_currency": "PEN",
-            "MRC_pen": 0,
-            "NRC_original": 0,
-            "NRC_currency": "PEN",
-            "NRC_pen": 0,
-            "VAN": 0,
-            "TIR": 0,
-            "payback": 0,
-            "totalRevenue": 0,
-            "totalExpense": 0,
-            "comisiones": 0,
-            "comisionesRate": 0,
-            "costoInstalacion": 0,
-            "costoInstalacionRatio": 0,
-            "grossMargin": 0,
-            "grossMarginRatio": 0,
-            "plazoContrato": default_plazo,
-            "costoCapitalAnual": master_vars['costoCapital'],
-            "tasaCartaFianza": master_vars['tasaCartaFianza'],
-            "costoCartaFianza": 0,
-            "aplicaCartaFianza": True,
-            "gigalan_region": None,
-            "gigalan_sale_type": None,
-            "gigalan_old_mrc": None,
-            "ApprovalStatus": "PENDING",
-            "submissionDate": None,
-            "approvalDate": None,
-            "rejection_note": None,
-            # Include empty timeline for frontend compatibility
-            "timeline": initialize_timeline(default_plazo)
-        }
+        # 3. Build the default transaction template from the static skeleton
+        template_transaction = _TEMPLATE_TRANSACTION.copy()
+        template_transaction["salesman"] = g.current_user.username
+        template_transaction["tipoCambio"] = master_vars['tipoCambio']
+        template_transaction["costoCapitalAnual"] = master_vars['costoCapital']
+        template_transaction["tasaCartaFianza"] = master_vars['tasaCartaFianza']
+        # Include empty timeline for frontend compatibility (fresh lists per response)
+        template_transaction["timeline"] = initialize_timeline(_TEMPLATE_DEFAULT_PLAZO)
 
         return {
             "success": True,
@@ -6,6 +6,7 @@ This module contains helper functions for file validation, service result handli
 and role-based authorization helpers (re-exported from jwt_auth for backward compatibility).
 """
 
+import math
 from functools import wraps
 from flask import jsonify, current_app, g
 from app.jwt_auth import admin_required, finance_admin_required
@@ -45,26 +46,41 @@ def _handle_service_result(result, default_error_status=500):
 
 def convert_to_json_safe(obj):
     """
-    Recursively converts values to JSON-safe types.
-    Ensures floats, ints, and None values serialize correctly.
+    Makes a structure JSON-safe by replacing special float values
+    (NaN, inf, -inf) with None.
 
-    Note: With numpy removed, this primarily validates standard Python types.
+    The walk is iterative and works in place: dicts and lists are only
+    touched where a non-finite float is found, so already-clean metrics are
+    returned as-is instead of being rebuilt. Numeric lists whose sum is
+    finite are skipped without a per-element loop. Returns the same object.
     """
-    if isinstance(obj, dict):
-        return {k: convert_to_json_safe(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [convert_to_json_safe(i) for i in obj]
-    elif isinstance(obj, float):
-        # Handle special float values
-        if obj != obj:  # NaN check (NaN != NaN is True)
-            return None
-        if obj == float('inf') or obj == float('-inf'):
-            return None
-        return obj
-    elif isinstance(obj, int):
-        return obj
-    elif obj is None:
-        return None
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+
+    stack = [obj]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            entries = node.items()
+        elif isinstance(node, list):
+            # Fast path for numeric rows (e.g. timeline series): sum() runs in C,
+            # and a finite total means no element is NaN or +/-inf
+            try:
+                if math.isfinite(sum(node)):
+                    continue
+            except TypeError:
+                pass  # Mixed/non-numeric list: walk it
+            entries = enumerate(node)
+        else:
+            continue
+
+        for key, value in entries:
+            if isinstance(value, float):
+                if not math.isfinite(value):
+                    node[key] = None
+            elif isinstance(value, (dict, list)):
+                stack.append(value)
+
     return obj
 
 
@@ -25,10 +25,14 @@ def calculate_npv(discount_rate, cash_flows):
         return None
 
     try:
+        # NPV formula: CF / (1 + r)^t
+        # NPV is a polynomial in x = 1 / (1 + r), so it is evaluated with
+        # Horner's scheme from the last period backwards: one multiply-add per
+        # period, with no power or division inside the loop.
+        x = 1 / (1 + discount_rate)
         npv = 0.0
-        for period, cash_flow in enumerate(cash_flows):
-            # NPV formula: CF / (1 + r)^t
-            npv += cash_flow / ((1 + discount_rate) ** period)
+        for cash_flow in reversed(cash_flows):
+            npv = npv * x + cash_flow
         return npv
     except (ValueError, TypeError, ZeroDivisionError, OverflowError):
         return None
@@ -59,8 +63,9 @@ def calculate_irr(cash_flows, max_iterations=100, tolerance=1e-6):
     Edge Cases:
         - Returns None if cash flows are empty
         - Returns None if all cash flows have same sign (no IRR exists)
-        - Returns None if derivative is zero (can't improve guess)
-        - Returns None if no convergence after max_iterations
+        - If Newton-Raphson stalls (zero derivative), leaves the -99%..1000% range
+          or does not converge after max_iterations, falls back to bisection over
+          that range; returns None only if NPV does not change sign within it
     """
     if not cash_flows or len(cash_flows) < 2:
         return None
@@ -77,31 +82,74 @@ def calculate_irr(cash_flows, max_iterations=100, tolerance=1e-6):
         # Initial guess: 10% (0.10)
         rate = 0.10
 
+        # NPV is a polynomial in x = 1 / (1 + r): NPV = Σ CF_t * x^t
+        # It is evaluated with Horner's scheme from the last period backwards,
+        # carrying dNPV/dx along in the same pass (2 multiply-adds per period)
+        reversed_flows = cash_flows[::-1]
+
         for iteration in range(max_iterations):
-            # Calculate NPV at current rate
-            npv = sum(cf / ((1 + rate) ** t) for t, cf in enumerate(cash_flows))
+            # Calculate NPV and its derivative (dNPV/dr) in a single pass
+            # Derivative formula: dNPV/dr = dNPV/dx * dx/dr, with dx/dr = -x^2
+            x = 1 / (1 + rate)
+            npv = 0.0
+            npv_dx = 0.0
+            for cf in reversed_flows:
+                npv_dx = npv_dx * x + npv
+                npv = npv * x + cf
+            derivative = -npv_dx * x * x
 
             # Check if we're close enough to zero
             if abs(npv) < tolerance:
                 return rate
 
-            # Calculate derivative (dNPV/dr) for Newton-Raphson
-            # Derivative formula: dNPV/dr = Σ [-t * CF_t / (1 + r)^(t+1)]
-            derivative = sum(-t * cf / ((1 + rate) ** (t + 1)) for t, cf in enumerate(cash_flows))
-
             # Avoid division by zero
             if abs(derivative) < 1e-10:
-                return None  # Can't improve guess
+                break  # Can't improve guess
 
             # Newton-Raphson step: x_new = x_old - f(x) / f'(x)
             rate = rate - npv / derivative
 
             # Sanity check: rate shouldn't be too extreme
             if rate < -0.99 or rate > 10:  # IRR between -99% and 1000%
-                return None  # Unrealistic rate, likely no convergence
+                break  # Unrealistic rate, likely no convergence
 
-        # Max iterations reached without convergence
-        return None
+        # Newton-Raphson did not converge: fall back to bracketed bisection
+        return _irr_bisection(cash_flows, tolerance=tolerance)
 
     except (ValueError, TypeError, ZeroDivisionError, OverflowError):
         return None
+
+
+def _irr_bisection(cash_flows, low=-0.99, high=10.0, max_iterations=200, tolerance=1e-6):
+    """
+    Bracketed IRR search used when Newton-Raphson fails to converge
+    (e.g. flat derivative or sign-alternating cash flows).
+
+    Searches the same -99% to 1000% range accepted by calculate_irr and always
+    converges when NPV changes sign over it.
+
+    Returns:
+        float: IRR as a decimal, or None if NPV has the same sign at both ends
+        (or cannot be evaluated)
+    """
+    npv_low = calculate_npv(low, cash_flows)
+    npv_high = calculate_npv(high, cash_flows)
+    if npv_low is None or npv_high is None or (npv_low > 0) == (npv_high > 0):
+        return None  # No sign change in range: no bracketed root
+
+    for iteration in range(max_iterations):
+        mid = (low + high) / 2
+        npv_mid = calculate_npv(mid, cash_flows)
+        if npv_mid is None:
+            return None
+
+        # Stop when NPV ≈ 0 or the bracket can no longer shrink meaningfully
+        if abs(npv_mid) < tolerance or (high - low) < 1e-12:
+            return mid
+
+        if (npv_mid > 0) == (npv_low > 0):
+            low, npv_low = mid, npv_mid
+        else:
+            high = mid
+
+    return (low + high) / 2
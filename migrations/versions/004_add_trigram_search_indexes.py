@@ -0,0 +1,43 @@
+"""Add trigram indexes for transaction list search
+
+Revision ID: 004_trgm_search
+Revises: 003_add_snapshot
+Create Date: 2026-10-16 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '004_trgm_search'
+down_revision = '003_add_snapshot'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """
+    Adds pg_trgm GIN indexes on clientName and salesman.
+
+    The transaction list search filters with ILIKE '%term%', which a btree index
+    cannot serve (leading wildcard), so every search was a sequential scan.
+    Trigram GIN indexes support ILIKE directly. submissionDate range filters and
+    ordering are already covered by the existing btree indexes.
+    """
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+    with op.batch_alter_table('transaction', schema=None) as batch_op:
+        batch_op.create_index('idx_transaction_clientname_trgm', ['clientName'], unique=False,
+                              postgresql_using='gin', postgresql_ops={'clientName': 'gin_trgm_ops'})
+        batch_op.create_index('idx_transaction_salesman_trgm', ['salesman'], unique=False,
+                              postgresql_using='gin', postgresql_ops={'salesman': 'gin_trgm_ops'})
+
+
+def downgrade():
+    """
+    Removes the trigram indexes (the pg_trgm extension is left installed).
+    """
+    with op.batch_alter_table('transaction', schema=None) as batch_op:
+        batch_op.drop_index('idx_transaction_salesman_trgm')
+        batch_op.drop_index('idx_transaction_clientname_trgm')
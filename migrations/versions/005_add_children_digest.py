@@ -0,0 +1,36 @@
+"""Add children_digest column to skip rewriting unchanged child rows
+
+Revision ID: 005_children_digest
+Revises: 004_trgm_search
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '005_children_digest'
+down_revision = '004_trgm_search'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """
+    Adds children_digest to the Transaction table.
+
+    Digest of the FixedCost / RecurringService rows as last written. Updates whose
+    child rows match it skip the DELETE + INSERT of the children. Existing rows
+    start as NULL, so their first update rewrites the children as before.
+    """
+    with op.batch_alter_table('transaction', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('children_digest', sa.String(length=32), nullable=True))
+
+
+def downgrade():
+    """
+    Removes children_digest from the Transaction table.
+    """
+    with op.batch_alter_table('transaction', schema=None) as batch_op:
+        batch_op.drop_column('children_digest')